@@ -1,19 +1,21 @@
 from __future__ import annotations
 
-from typing import Annotated, Literal
+from typing import Annotated, Any, Literal
 
 import json
 import httpx
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, WithJsonSchema, create_model
 from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
+from langchain_core.callbacks.manager import adispatch_custom_event
 from langchain_core.messages import SystemMessage, HumanMessage
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition, InjectedState
 
 from app.config import settings
-from app.agents.face.prompts import SPECIALIST_SYSTEM_PROMPTS
+from app.agents.face.prompts import SPECIALIST_ALLOWED_MODELS, SPECIALIST_SYSTEM_PROMPTS
 from app.agents.face.state import FaceAgentState
+from app.agents.face.hedge import hedged_invoke
 
 
 # Bundle C: structured output returned by the specialist LLM call.
@@ -23,38 +25,44 @@ class SpecialistResult(BaseModel):
     model: str = Field(description="Generation model identifier. Must be non-empty.")
 
 
-@tool("generate")
-async def generate(
-    route: Literal["t2i", "i2i", "m2i", "i2v"],
-    intent: str,
-    state: Annotated[FaceAgentState, InjectedState],
-) -> str:
-    """Bundle C implementation.
+# Custom event name surfaced by stream_agent as the "tool_progress" SSE event.
+TOOL_PROGRESS_EVENT = "tool_progress"
 
-    Requirements:
-    - Tool name is exactly "generate".
-    - LLM-visible args are only {route, intent}.
-    - Reads server-owned context via InjectedState.
-    - Never raises.
-    - Always includes route + video in return.
+
+async def _progress(stage: str, route: str, video: bool) -> None:
+    """Report a generate stage to astream_events consumers. Never raises."""
+    try:
+        await adispatch_custom_event(TOOL_PROGRESS_EVENT, {"stage": stage, "route": route, "video": video})
+    except Exception:
+        # No parent run (e.g. tool called outside the graph): progress is best-effort only.
+        pass
+
+
+# Locked generate return contract fields.
+TOOL_RESULT_FIELDS = ("ok", "error_code", "route", "video", "amount", "model")
+
+
+def parse_tool_result(output: Any) -> dict:
+    """Extract the locked contract fields from a generate tool output. Never raises.
+
+    ToolNode wraps the tool's JSON string in a ToolMessage; plain strings are accepted too.
     """
-    # Bundle C: always include route + video (locked contract).
-    video = route == "i2v"
+    content = getattr(output, "content", output)
+    try:
+        result = json.loads(content) if isinstance(content, str) else {}
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(result, dict):
+        return {}
+    return {k: result[k] for k in TOOL_RESULT_FIELDS if k in result}
 
-    webhook_url = settings.N8N_WEBHOOK_URL
-    if not webhook_url:
-        return json.dumps({"ok": False, "error_code": "missing_webhook_url", "route": route, "video": video})
 
-    specialist_system_prompt = SPECIALIST_SYSTEM_PROMPTS.get(route)
-    if not specialist_system_prompt:
-        return json.dumps({"ok": False, "error_code": "invalid_route", "route": route, "video": video})
+def _error(error_code: str, route: str, video: bool) -> str:
+    return json.dumps({"ok": False, "error_code": error_code, "route": route, "video": video})
 
-    # Server-owned context (must NOT be provided by the LLM tool args)
-    project_id = state["project_id"]
-    selected_ids = state["selected_ids"]
-    requested_aspect = state.get("requested_aspect")
 
-    # Specialist call: non-streaming, temperature=0, structured output.
+async def _run_specialist(route: str, intent: str) -> SpecialistResult | None:
+    """Specialist call: non-streaming, temperature=0, structured output. Returns None on any failure."""
     try:
         specialist_llm = ChatOpenAI(
             model=settings.MODEL_NAME,
@@ -62,22 +70,61 @@ async def generate(
             temperature=0,
         )
         structured = specialist_llm.with_structured_output(SpecialistResult)
-        specialist_out: SpecialistResult = await structured.ainvoke(
+        return await structured.ainvoke(
             [
-                SystemMessage(content=specialist_system_prompt),
+                SystemMessage(content=SPECIALIST_SYSTEM_PROMPTS[route]),
                 HumanMessage(content=intent),
             ]
         )
     except Exception:
-        return json.dumps({"ok": False, "error_code": "specialist_parse_error", "route": route, "video": video})
+        return None
+
+
+def _is_valid_result(result: SpecialistResult, allowed_models: tuple[str, ...] | None = None) -> bool:
+    # Deterministic validation. bool is an int subclass, so reject it explicitly.
+    if not isinstance(result.amount, int) or isinstance(result.amount, bool) or result.amount < 1:
+        return False
+    if not isinstance(result.model, str) or not result.model.strip():
+        return False
+    if not isinstance(result.prompt, str) or not result.prompt.strip():
+        return False
+    if allowed_models is not None and result.model not in allowed_models:
+        return False
+    return True
+
+
+async def _generate(
+    route: str,
+    intent: str,
+    state: FaceAgentState,
+    direct: SpecialistResult | None = None,
+) -> str:
+    """Shared body of both generate tool variants. Never raises."""
+    # Bundle C: always include route + video (locked contract).
+    video = route == "i2v"
+
+    webhook_url = settings.N8N_WEBHOOK_URL
+    if not webhook_url:
+        return _error("missing_webhook_url", route, video)
 
-    # Deterministic validation
-    if not isinstance(specialist_out.amount, int) or specialist_out.amount < 1:
-        return json.dumps({"ok": False, "error_code": "specialist_parse_error", "route": route, "video": video})
-    if not isinstance(specialist_out.model, str) or not specialist_out.model.strip():
-        return json.dumps({"ok": False, "error_code": "specialist_parse_error", "route": route, "video": video})
-    if not isinstance(specialist_out.prompt, str) or not specialist_out.prompt.strip():
-        return json.dumps({"ok": False, "error_code": "specialist_parse_error", "route": route, "video": video})
+    if not SPECIALIST_SYSTEM_PROMPTS.get(route):
+        return _error("invalid_route", route, video)
+
+    # Server-owned context (must NOT be provided by the LLM tool args)
+    project_id = state["project_id"]
+    selected_ids = state["selected_ids"]
+    requested_aspect = state.get("requested_aspect")
+
+    if route in settings.SINGLE_SHOT_ROUTES:
+        # Single-shot: the agent already supplied the fields; skip the specialist round trip.
+        if direct is None or not _is_valid_result(direct, SPECIALIST_ALLOWED_MODELS.get(route, ())):
+            return _error("specialist_parse_error", route, video)
+        specialist_out = direct
+    else:
+        await _progress("specialist", route, video)
+        specialist_out = await _run_specialist(route, intent)
+        if specialist_out is None or not _is_valid_result(specialist_out):
+            return _error("specialist_parse_error", route, video)
 
     payload = {
         "project_id": project_id,
@@ -90,17 +137,19 @@ async def generate(
         "video": video,
     }
 
+    await _progress("webhook", route, video)
+
     # Tight timeout; never raise.
     try:
         timeout = httpx.Timeout(10.0)
         async with httpx.AsyncClient(timeout=timeout) as client:
             resp = await client.post(webhook_url, json=payload)
             if resp.status_code < 200 or resp.status_code >= 300:
-                return json.dumps({"ok": False, "error_code": "webhook_http_error", "route": route, "video": video})
+                return _error("webhook_http_error", route, video)
     except httpx.TimeoutException:
-        return json.dumps({"ok": False, "error_code": "webhook_timeout", "route": route, "video": video})
+        return _error("webhook_timeout", route, video)
     except Exception:
-        return json.dumps({"ok": False, "error_code": "webhook_network_error", "route": route, "video": video})
+        return _error("webhook_network_error", route, video)
 
     return json.dumps({
         "ok": True,
@@ -111,23 +160,116 @@ async def generate(
     })
 
 
-def build_face_graph(llm: ChatOpenAI):
+@tool("generate")
+async def generate(
+    route: Literal["t2i", "i2i", "m2i", "i2v"],
+    intent: str,
+    state: Annotated[FaceAgentState, InjectedState],
+) -> str:
+    """Bundle C implementation.
+
+    Requirements:
+    - Tool name is exactly "generate".
+    - LLM-visible args are only {route, intent}.
+    - Reads server-owned context via InjectedState.
+    - Never raises.
+    - Always includes route + video in return.
+    """
+    return await _generate(route, intent, state)
+
+
+def _single_shot_description() -> str:
+    lines = [
+        "Start an image/video generation job.",
+        "Always pass route and a short intent.",
+        "For the routes below, ALSO pass prompt (string, final production-grade prompt), "
+        "amount (integer >= 1, keep it reasonable) and model (string, EXACTLY one of the listed identifiers):",
+    ]
+    for route in settings.SINGLE_SHOT_ROUTES:
+        lines.append(f"- {route}: {', '.join(SPECIALIST_ALLOWED_MODELS[route])}")
+    lines.append("For other routes, omit prompt, amount and model.")
+    return "\n".join(lines)
+
+
+def _single_shot_args_schema() -> type[BaseModel]:
+    """Args schema for the single-shot generate tool.
+
+    The LLM sees typed fields (string, integer >= 1, enum of the configured routes' models), but
+    prompt/amount/model validate as Any: a bad value such as amount="2" must reach _is_valid_result
+    and keep the locked specialist_parse_error contract instead of failing in ToolNode.
+    """
+    models = sorted({m for route in settings.SINGLE_SHOT_ROUTES for m in SPECIALIST_ALLOWED_MODELS[route]})
+    return create_model(
+        "generate",
+        route=(Literal["t2i", "i2i", "m2i", "i2v"], ...),
+        intent=(str, ...),
+        state=(Annotated[FaceAgentState, InjectedState], ...),
+        prompt=(Annotated[Any, WithJsonSchema({"type": "string"})], None),
+        amount=(Annotated[Any, WithJsonSchema({"type": "integer", "minimum": 1})], None),
+        model=(Annotated[Any, WithJsonSchema({"type": "string", "enum": models})], None),
+    )
+
+
+async def _generate_single_shot(
+    route: str,
+    intent: str,
+    state: FaceAgentState,
+    prompt: Any = None,
+    amount: Any = None,
+    model: Any = None,
+) -> str:
+    direct = None
+    if prompt is not None and amount is not None and model is not None:
+        direct = SpecialistResult.model_construct(prompt=prompt, amount=amount, model=model)
+    return await _generate(route, intent, state, direct=direct)
+
+
+def build_generate_tool():
+    """Return the generate tool to bind for the current settings.
+
+    With SINGLE_SHOT_ROUTES empty this is the locked {route, intent} tool. Otherwise the
+    schema also carries prompt/amount/model so configured routes skip the specialist call.
+    """
+    if not settings.SINGLE_SHOT_ROUTES:
+        return generate
+    return tool(
+        "generate",
+        description=_single_shot_description(),
+        args_schema=_single_shot_args_schema(),
+    )(_generate_single_shot)
+
+
+def build_face_graph(llm: ChatOpenAI, hedge_llm: ChatOpenAI | None = None):
     """Bundle B: standard tool loop.
 
     agent (LLM+tools) -> ToolNode -> agent ... until no tool calls -> END
+
+    With HEDGE_AFTER_MS set, the agent node hedges slow first tokens against hedge_llm
+    (or a second request to llm when hedge_llm is None).
     """
 
-    llm_with_tools = llm.bind_tools([generate])
+    generate_tool = build_generate_tool()
+    llm_with_tools = llm.bind_tools([generate_tool])
+    hedge_with_tools = hedge_llm.bind_tools([generate_tool]) if hedge_llm else llm_with_tools
 
     async def agent_node(state: FaceAgentState) -> dict:
         messages = state["messages"]
-        response = await llm_with_tools.ainvoke(messages)
+        if settings.HEDGE_AFTER_MS:
+            response = await hedged_invoke(
+                llm_with_tools,
+                hedge_with_tools,
+                messages,
+                hedge_after=settings.HEDGE_AFTER_MS / 1000,
+                max_rate=settings.HEDGE_MAX_RATE,
+            )
+        else:
+            response = await llm_with_tools.ainvoke(messages)
         return {"messages": [response]}
 
     graph = StateGraph(FaceAgentState)
 
     graph.add_node("agent", agent_node)
-    graph.add_node("tools", ToolNode([generate]))
+    graph.add_node("tools", ToolNode([generate_tool]))
 
     graph.add_edge(START, "agent")
 
@@ -0,0 +1,159 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Sequence
+
+from langchain_core.runnables import Runnable
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, message_chunk_to_message
+from langchain_core.callbacks.manager import adispatch_custom_event
+
+from app.logging import get_logger
+
+logger = get_logger("hedge")
+
+# Custom event carrying the winning candidate's chunks; stream_agent treats it like a model token.
+AGENT_TOKEN_EVENT = "agent_token"
+
+
+def _p99(values: Sequence[float]) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+class HedgeStats:
+    """Rolling window of agent requests, used both to cap the hedge rate and to report it.
+
+    A losing primary is cancelled at once, so production never observes the unhedged TTFT; the p99
+    improvement is measured against an unhedged run in the fake-provider benchmark
+    (tests/test_hedge.py). A snapshot is logged every report_every requests.
+    """
+
+    def __init__(self, window: int = 200, report_every: int = 100):
+        self.hedged: deque[bool] = deque(maxlen=window)
+        self.ttft: deque[float] = deque(maxlen=window)
+        self.hedge_wins = 0
+        self.total = 0
+        self.report_every = report_every
+
+    def allow_hedge(self, max_rate: float) -> bool:
+        # Count the in-flight request (already recorded as not hedged) as if it were hedged.
+        requests = len(self.hedged)
+        hedges = sum(self.hedged) + 1
+        return hedges / requests <= max_rate
+
+    def record(self, ttft: float, hedge_won: bool) -> None:
+        self.ttft.append(ttft)
+        if hedge_won:
+            self.hedge_wins += 1
+        self.total += 1
+        if self.report_every and self.total % self.report_every == 0:
+            logger.info(f"hedge stats | {self.snapshot()}")
+
+    def snapshot(self) -> dict:
+        requests = len(self.hedged)
+        ttft_p99 = _p99(self.ttft)
+        return {
+            "requests": requests,
+            "hedge_rate": (sum(self.hedged) / requests) if requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "ttft_p99_ms": round(ttft_p99 * 1000, 1) if ttft_p99 is not None else None,
+        }
+
+
+hedge_stats = HedgeStats()
+
+
+async def _next_chunk(stream: AsyncIterator[AIMessageChunk]) -> AIMessageChunk | None:
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def _discard(task: asyncio.Future, stream: AsyncIterator) -> None:
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+    aclose = getattr(stream, "aclose", None)
+    if aclose:
+        try:
+            await aclose()
+        except Exception:
+            pass
+
+
+async def hedged_invoke(
+    primary: Runnable,
+    secondary: Runnable,
+    messages: list[BaseMessage],
+    hedge_after: float,
+    max_rate: float,
+    stats: HedgeStats = hedge_stats,
+) -> AIMessage:
+    """Stream from primary; if no first chunk arrives within hedge_after seconds, race a secondary.
+
+    Whichever candidate yields a first chunk first wins and the other is cancelled. A candidate that
+    fails before its first chunk never wins; the error is raised only if every candidate failed.
+    Candidates run with callbacks silenced so the loser can never leak tokens; the winner's chunks
+    are re-dispatched as AGENT_TOKEN_EVENT custom events.
+    """
+    started = time.perf_counter()
+    silent: dict[str, Any] = {"callbacks": []}
+    streams = [primary.astream(messages, config=silent)]
+    stats.hedged.append(False)
+
+    pending = {asyncio.ensure_future(_next_chunk(streams[0])): 0}
+    winner_task: asyncio.Future | None = None
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+
+        if not done and stats.allow_hedge(max_rate):
+            stats.hedged[-1] = True
+            streams.append(secondary.astream(messages, config=silent))
+            pending[asyncio.ensure_future(_next_chunk(streams[1]))] = 1
+            logger.info(f"hedging agent request after {hedge_after * 1000:.0f}ms | {stats.snapshot()}")
+
+        while winner_task is None:
+            while not done:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Prefer the primary on a tie so the choice is deterministic.
+            ordered = sorted(done, key=lambda t: pending[t])
+            winner_task = next((t for t in ordered if t.exception() is None), None)
+            if winner_task is None:
+                if len(done) == len(pending):
+                    # Every candidate failed: surface the error as an unhedged call would.
+                    raise ordered[0].exception()
+                for task in ordered:
+                    idx = pending.pop(task)
+                    logger.warning(f"hedge candidate {idx} failed before its first chunk: {task.exception()!r}")
+                    await _discard(task, streams[idx])
+                done = set()
+    except BaseException:
+        # Cancelled while waiting (e.g. client disconnect) or all candidates failed: never leave a
+        # request running.
+        for task, idx in pending.items():
+            await _discard(task, streams[idx])
+        raise
+
+    winner = pending[winner_task]
+    stats.record(time.perf_counter() - started, hedge_won=winner == 1)
+    for task, idx in pending.items():
+        if idx != winner:
+            await _discard(task, streams[idx])
+
+    stream = streams[winner]
+    chunk = winner_task.result()
+    aggregate: AIMessageChunk | None = None
+    while chunk is not None:
+        aggregate = chunk if aggregate is None else aggregate + chunk
+        if isinstance(chunk.content, str) and chunk.content:
+            await adispatch_custom_event(AGENT_TOKEN_EVENT, {"content": chunk.content})
+        chunk = await _next_chunk(stream)
+
+    if aggregate is None:
+        return AIMessage(content="")
+    return message_chunk_to_message(aggregate)
@@ -1,50 +1,76 @@
-SYSTEM_PROMPT = """You are a canvas assistant for image projects.
+_GENERATE_STEP = "2) Call generate(route,intent) first."
+
+SYSTEM_PROMPT = f"""You are a canvas assistant for image projects.
 If images are provided, treat them as visual references.
 Do not claim to see things unless they are visibly present in the provided images.
 Respond helpfully and concisely.
 
 If the user asks to generate or edit images/videos:
 1) Decide route in {"t2i","i2i","m2i","i2v"} and a short intent string.
-2) Call generate(route,intent) first.
+{_GENERATE_STEP}
 3) Only after the tool returns, explain what will happen / what you did.
 """
 
+
+
+def build_system_prompt(single_shot_routes: list[str]) -> str:
+    """SYSTEM_PROMPT for the configured generate tool.
+
+    Single-shot routes skip the specialist, so the agent itself must write prompt/amount/model.
+    """
+    if not single_shot_routes:
+        return SYSTEM_PROMPT
+    step = (
+        f"2) Call generate(route,intent) first. For route {'/'.join(single_shot_routes)} also pass "
+        "prompt (final production-grade prompt), amount and model exactly as the generate tool describes."
+    )
+    return SYSTEM_PROMPT.replace(_GENERATE_STEP, step)
+
+# Allowed generation models per route. Single source for the "EXACTLY one of" prompt lines below,
+# SINGLE_SHOT_ROUTES validation and single-shot generate calls that bypass the specialist.
+SPECIALIST_ALLOWED_MODELS: dict[str, tuple[str, ...]] = {
+    "t2i": ("gpt4o_image",),
+    "i2i": ("nano_banana", "nano_banana_pro"),
+    "m2i": ("nano_banana_pro",),
+    "i2v": ("sora_kie_standard", "sora_kie_hd", "veo_fast", "veo_standard"),
+}
+
 # Bundle C: specialist prompts used inside the generate tool (non-streaming specialist call).
 # Exactly 4 prompts, one per route.
 SPECIALIST_SYSTEM_PROMPTS: dict[str, str] = {
     # Model names MUST match the n8n workflow's supported identifiers exactly.
     # Image models: gpt4o_image | nano_banana | nano_banana_pro
     # Video models: sora_kie_standard | sora_kie_hd | veo_fast | veo_standard
-    "t2i": """You are a specialist prompt-writer for text-to-image generation.
+    "t2i": f"""You are a specialist prompt-writer for text-to-image generation.
 
 Return ONLY structured output with fields:
 - prompt: string
 - amount: int (>= 1). Keep amount reasonable (1–4).
-- model: string. Must be EXACTLY one of: gpt4o_image,
+- model: string. Must be EXACTLY one of: {', '.join(SPECIALIST_ALLOWED_MODELS['t2i'])}
 
 The prompt should be production-grade and specific. Do not include JSON fences or extra commentary.""",
-    "i2i": """You are a specialist prompt-writer for image-to-image editing.
+    "i2i": f"""You are a specialist prompt-writer for image-to-image editing.
 
 Return ONLY structured output with fields:
 - prompt: string
 - amount: int (>= 1). Keep amount reasonable (1–4).
-- model: string. Must be EXACTLY one of: nano_banana, nano_banana_pro
+- model: string. Must be EXACTLY one of: {', '.join(SPECIALIST_ALLOWED_MODELS['i2i'])}
 
 The prompt should describe the edit precisely, assuming the image(s) are provided externally. No extra commentary.""",
-    "m2i": """You are a specialist prompt-writer for multi-image to image generation/editing.
+    "m2i": f"""You are a specialist prompt-writer for multi-image to image generation/editing.
 
 Return ONLY structured output with fields:
 - prompt: string
 - amount: int (>= 1). Keep amount reasonable (1–4).
-- model: string. Must be EXACTLY one of: nano_banana_pro
+- model: string. Must be EXACTLY one of: {', '.join(SPECIALIST_ALLOWED_MODELS['m2i'])}
 
 The prompt should be consistent across multiple references. No extra commentary.""",
-    "i2v": """You are a specialist prompt-writer for image-to-video generation.
+    "i2v": f"""You are a specialist prompt-writer for image-to-video generation.
 
 Return ONLY structured output with fields:
 - prompt: string
 - amount: int (>= 1). Keep amount reasonable (1–2).
-- model: string. Must be EXACTLY one of: sora_kie_standard, sora_kie_hd, veo_fast, veo_standard
+- model: string. Must be EXACTLY one of: {', '.join(SPECIALIST_ALLOWED_MODELS['i2v'])}
 
 The prompt should describe motion/temporal edits clearly. No extra commentary.""",
 }
@@ -2,39 +2,83 @@ import time
 import asyncio
 import uuid
 import asyncpg
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Callable
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from app.logging import get_logger
 from app.api.models import ChatRequest, sse_event
 from app.config import settings
 from app.api.deps import verify_token
-from app.db.chat import add_user_message, add_assistant_message, get_messages, verify_project_ownership
+from app.db.cache import warm_cache
+from app.db.chat import HISTORY_LIMIT, add_user_message, add_assistant_message, get_messages, render_context, verify_project_ownership
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import HumanMessage
 
-from app.agents.face.graph import build_face_graph
+from app.agents.face.graph import TOOL_PROGRESS_EVENT, build_face_graph, parse_tool_result
+from app.agents.face.hedge import AGENT_TOKEN_EVENT
 from app.agents.face.state import FaceAgentState
 from app.agents.face.vision import build_human_message
-from app.agents.face.prompts import SYSTEM_PROMPT
+from app.trace import TraceRecorder
 
 router = APIRouter()
 logger = get_logger("chat")
 
+def tool_event_to_sse(event: dict, encode: Callable[[str, dict], Any] = sse_event) -> Any:
+    """Map graph tool execution events to tool_start/tool_progress/tool_end SSE events.
+
+    Returns None for anything that is not a generate tool event. Clients that do not
+    know these event types simply ignore them.
+    """
+    kind = event.get("event")
+    data = event.get("data") or {}
+
+    if kind == "on_custom_event" and event.get("name") == TOOL_PROGRESS_EVENT:
+        return encode("tool_progress", {"name": "generate", **data})
+
+    if event.get("name") != "generate":
+        return None
+
+    if kind == "on_tool_start":
+        tool_input = data.get("input")
+        route = tool_input.get("route") if isinstance(tool_input, dict) else None
+        return encode("tool_start", {"name": "generate", "route": route, "video": route == "i2v"})
+
+    if kind == "on_tool_end":
+        return encode("tool_end", {"name": "generate", **parse_tool_result(data.get("output"))})
+
+    return None
+
 async def stream_agent(
     state: FaceAgentState,
     request_id: str,
     pool: asyncpg.Pool,
     project_id: str,
-) -> AsyncGenerator[str, None]:
+    llm: BaseChatModel | None = None,
+    encode: Callable[[str, dict], Any] = sse_event,
+    recorder: TraceRecorder | None = None,
+) -> AsyncGenerator[Any, None]:
+    """Run one agent turn and yield encoded token/tool_*/error/done events.
+
+    encode defaults to SSE strings; the WebSocket transport passes its own framing.
+    recorder replaces the TRACE_DIR recorder; replay passes an in-memory one so it never
+    appends to the trace files.
+    """
     start_time = time.time()
     token_count = 0
     observed_events = set()
     full_content_parts: list[str] = []
+    if recorder is None and settings.TRACE_DIR:
+        recorder = TraceRecorder(settings.TRACE_DIR, request_id, state)
     
     try:
-        llm = ChatOpenAI(model=settings.MODEL_NAME, streaming=True)
-        graph = build_face_graph(llm)
+        # llm is injectable for offline replay (app/replay.py); production always uses OpenAI.
+        hedge_llm = None
+        if llm is None:
+            llm = ChatOpenAI(model=settings.MODEL_NAME, streaming=True)
+            if settings.HEDGE_AFTER_MS and settings.HEDGE_MODEL:
+                hedge_llm = ChatOpenAI(model=settings.HEDGE_MODEL, streaming=True)
+        graph = build_face_graph(llm, hedge_llm)
         
         stream_events = {"on_chat_model_stream", "on_llm_stream"}
         
@@ -47,12 +91,27 @@ async def stream_agent(
                 chunk = event.get("data", {}).get("chunk")
                 # Safe content coercion
                 content = chunk.content if chunk and hasattr(chunk, "content") and isinstance(chunk.content, str) else ""
+            elif kind == "on_custom_event" and event.get("name") == AGENT_TOKEN_EVENT:
+                # Hedged agent requests re-dispatch the winning candidate's chunks as custom events.
+                content = event.get("data", {}).get("content") or ""
+            else:
+                content = None
+
+            if content is not None:
+                if recorder:
+                    recorder.on_event(event, content)
                 
                 if content:
                     token_count += 1
                     # Buffer tokens so we can persist the assistant message after streaming completes.
                     full_content_parts.append(content)
-                    yield sse_event("token", {"content": content})
+                    yield encode("token", {"content": content})
+            else:
+                if recorder:
+                    recorder.on_event(event)
+                tool_sse = tool_event_to_sse(event, encode)
+                if tool_sse:
+                    yield tool_sse
         
         # Persist assistant row only after streaming finishes (never before). If empty, write nothing.
         combined_content = "".join(full_content_parts)
@@ -66,7 +125,9 @@ async def stream_agent(
             logger.warning(f"[{request_id}] zero tokens streamed. Observed events: {list(observed_events)[:5]}")
             
         logger.info(f"[{request_id}] complete | elapsed={elapsed:.2f}s | tokens={token_count}")
-        yield sse_event("done", {})
+        if recorder:
+            await recorder.finish("done")
+        yield encode("done", {})
     except asyncio.CancelledError:
         # Treat disconnect as a stream error for persistence rules:
         # persist partial content only if any tokens were streamed; otherwise persist nothing.
@@ -83,6 +144,12 @@ async def stream_agent(
                 logger.error(f"[{request_id}] failed to save partial assistant content on disconnect: {db_err}")
 
         logger.info(f"[{request_id}] client disconnected")
+        if recorder:
+            try:
+                # The task is already cancelled; shield the trace write like the partial persist above.
+                await asyncio.shield(recorder.finish("cancelled"))
+            except asyncio.CancelledError:
+                pass
         raise
     except Exception as e:
         logger.error(f"[{request_id}] error: {e}")
@@ -94,34 +161,43 @@ async def stream_agent(
                     await add_assistant_message(conn, project_id, combined_content)
             except Exception as db_err:
                 logger.error(f"[{request_id}] failed to save partial assistant content on error: {db_err}")
-        yield sse_event("error", {"message": str(e), "code": "stream_error"})
-        yield sse_event("done", {})
+        if recorder:
+            await recorder.finish("error")
+        yield encode("error", {"message": str(e), "code": "stream_error"})
+        yield encode("done", {})
 
-@router.post("/chat")
-async def chat(request: ChatRequest, req: Request, user_id: str = Depends(verify_token)):
+async def prepare_turn(pool: asyncpg.Pool, request: ChatRequest, user_id: str) -> tuple[FaceAgentState, str]:
+    """Verify ownership, persist the user message and assemble agent state. Returns (state, request_id).
+
+    Raises HTTPException(403) if the user does not own the project.
+    """
     # No request_id field/idempotency in the API contract; request_id here is for logging only.
-    
-    pool = req.app.state.db_pool
     project_id_str = str(request.project_id)
     
-    # Safety: ensure history is always defined in the success path.
-    history = []
-    
+    # A context staged by POST /projects/{id}/warm already proved ownership and holds the rendered
+    # history, so only the user-message insert remains. Expired/missing slots fall back to Postgres.
+    context = warm_cache.take(user_id, project_id_str)
+    warm = context is not None
+
     async with pool.acquire() as conn:
         # 1. Ownership Check
-        if not await verify_project_ownership(conn, project_id_str, user_id):
+        if not warm and not await verify_project_ownership(conn, project_id_str, user_id):
             raise HTTPException(status_code=403, detail="Access denied")
             
         # 2. Insert User Message
         await add_user_message(conn, project_id_str, user_id, request.chatInput)
 
         # 3. Fetch History (roles user/assistant only, limit 50, oldest -> newest)
-        history = await get_messages(conn, project_id_str, limit=50)
+        if not warm:
+            history = await get_messages(conn, project_id_str, limit=HISTORY_LIMIT)
 
-    # Dedupe rule: we inserted the current user message as text-only into DB, but we want the image-aware
-    # `build_human_message(...)` version in memory. Drop the last history entry only if it matches this request.
-    if history and isinstance(history[-1], HumanMessage) and history[-1].content == request.chatInput:
-        history.pop()
+    if not warm:
+        # Dedupe rule: we inserted the current user message as text-only into DB, but we want the image-aware
+        # `build_human_message(...)` version in memory. Drop the last history entry only if it matches this request.
+        # (Staged context was loaded before the insert, so it never contains the current message.)
+        if history and isinstance(history[-1], HumanMessage) and history[-1].content == request.chatInput:
+            history.pop()
+        context = render_context(history)
 
     request_id = str(uuid.uuid4())[:8]
     
@@ -135,12 +211,13 @@ async def chat(request: ChatRequest, req: Request, user_id: str = Depends(verify
         f"selection_count={selection_count} "
         f"thumb_urls_received={thumb_urls_received} "
         f"thumb_urls_used={thumb_urls_used} "
-        f"thumb_urls_dropped={thumb_urls_dropped}"
+        f"thumb_urls_dropped={thumb_urls_dropped} "
+        f"warm={warm}"
     )
     thumb_urls_capped = request.thumb_urls[:4]
     state: FaceAgentState = {
-        # Inject SYSTEM_PROMPT in-memory only; never store it in Postgres.
-        "messages": [SystemMessage(content=SYSTEM_PROMPT)] + history + [build_human_message(request.chatInput, thumb_urls_capped)],
+        # context already starts with the in-memory system prompt (see render_context).
+        "messages": context + [build_human_message(request.chatInput, thumb_urls_capped)],
         # FaceAgentState declares project_id as str, so keep state consistent.
         "project_id": project_id_str,
         "selected_ids": request.selected_ids,
@@ -150,8 +227,14 @@ async def chat(request: ChatRequest, req: Request, user_id: str = Depends(verify
         "requested_aspect": request.requested_aspect,
         "client_model": request.client_model,
     }
+    return state, request_id
+
+@router.post("/chat")
+async def chat(request: ChatRequest, req: Request, user_id: str = Depends(verify_token)):
+    pool = req.app.state.db_pool
+    state, request_id = await prepare_turn(pool, request, user_id)
     return StreamingResponse(
-        stream_agent(state, request_id, pool, project_id_str),
+        stream_agent(state, request_id, pool, state["project_id"]),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -5,21 +5,28 @@ from app.config import settings
 
 security = HTTPBearer(auto_error=True)
 
+# Allowed clock skew when checking exp, both at decode time and for long-lived WebSockets.
+JWT_LEEWAY_S = 30
+
+def decode_token(token: str) -> dict:
+    """Validate a Supabase JWT and return its claims. Raises jwt.InvalidTokenError subclasses."""
+    issuer = f"{settings.SUPABASE_URL}/auth/v1"
+    payload = jwt.decode(
+        token,
+        settings.SUPABASE_JWT_SECRET,
+        algorithms=["HS256"],
+        audience=settings.JWT_AUDIENCE,
+        issuer=issuer,
+        options={"require": ["exp", "sub", "aud", "iss"]},
+        leeway=JWT_LEEWAY_S,  # avoids failures from small clock skew
+    )
+    return payload
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> str:
     token = credentials.credentials
-    issuer = f"{settings.SUPABASE_URL}/auth/v1"
     
     try:
-        payload = jwt.decode(
-            token,
-            settings.SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            audience=settings.JWT_AUDIENCE,
-            issuer=issuer,
-            options={"require": ["exp", "sub", "aud", "iss"]},
-            leeway=30,  # avoids failures from small clock skew
-        )
-        return payload["sub"]
+        return decode_token(token)["sub"]
         
     except jwt.ExpiredSignatureError:
         raise HTTPException(
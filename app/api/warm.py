@@ -0,0 +1,29 @@
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.logging import get_logger
+from app.api.deps import verify_token
+from app.db.chat import HISTORY_LIMIT, get_messages, render_context, verify_project_ownership
+from app.db.cache import warm_cache
+
+router = APIRouter()
+logger = get_logger("warm")
+
+
+@router.post("/projects/{project_id}/warm")
+async def warm(project_id: UUID, req: Request, user_id: str = Depends(verify_token)):
+    pool = req.app.state.db_pool
+    project_id_str = str(project_id)
+    # Read before loading so a message written while we query makes put() discard the snapshot.
+    version = warm_cache.version()
+
+    async with pool.acquire() as conn:
+        if not await verify_project_ownership(conn, project_id_str, user_id):
+            raise HTTPException(status_code=403, detail="Access denied")
+        history = await get_messages(conn, project_id_str, limit=HISTORY_LIMIT)
+
+    staged = warm_cache.put(user_id, project_id_str, render_context(history), version)
+    logger.info(
+        f"warm | user_id={user_id} | project_id={project_id_str} | history={len(history)} "
+        f"| staged={staged} | slots={len(warm_cache)}"
+    )
+    return {"status": "warm", "ttl_s": warm_cache.ttl_s}
@@ -0,0 +1,218 @@
+import json
+import time
+import asyncio
+import jwt
+from typing import Any, AsyncGenerator
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from app.logging import get_logger
+from app.api.models import ChatRequest
+from app.api.chat import prepare_turn, stream_agent
+from app.api.deps import JWT_LEEWAY_S, decode_token
+from app.config import settings
+
+router = APIRouter()
+logger = get_logger("ws")
+
+AUTH_TIMEOUT_S = 10.0
+MAX_CONCURRENT_TURNS = 4
+# RFC 6455 policy violation: used for auth and origin failures.
+WS_POLICY_VIOLATION = 1008
+
+
+def ws_frame(turn_id: str | None, event: str, data: dict) -> dict:
+    return {"turn_id": turn_id, "event": event, "data": data}
+
+
+async def _cancel_stream(agen: AsyncGenerator | None) -> None:
+    """Deliver cancellation to a suspended stream_agent so its partial-persistence path runs,
+    exactly as on an SSE disconnect."""
+    if agen is not None and agen.ag_frame is not None and not agen.ag_running:
+        try:
+            await agen.athrow(asyncio.CancelledError())
+        except BaseException:
+            pass
+
+
+class TurnMux:
+    """Multiplexes concurrent chat turns over one authenticated WebSocket.
+
+    Client frames:
+      {"type": "auth", "token": "<jwt>"}                 (first frame only)
+      {"type": "chat", "turn_id": "...", ...ChatRequest}
+      {"type": "cancel", "turn_id": "..."}
+    Server frames: {"turn_id", "event", "data"} with the same token/tool_*/error/done events
+    as the SSE stream. Every turn ends with exactly one done frame while the socket is open.
+
+    Once the JWT's exp (plus the verify_token leeway) passes, new chat frames are rejected with
+    code "token_expired"; turns already running finish, like an SSE stream outliving its token.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str, expires_at: float):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.expires_at = expires_at
+        self.turns: dict[str, asyncio.Task] = {}
+        self.cancel_requested: set[str] = set()
+        self.connected = True
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, frame: dict) -> None:
+        if not self.connected:
+            return
+        # Turns run as concurrent tasks; serialize writes so frames never interleave.
+        async with self._send_lock:
+            await self.websocket.send_json(frame)
+
+    async def run_turn(self, turn_id: str, request: ChatRequest) -> None:
+        pool = self.websocket.app.state.db_pool
+        agen = None
+        try:
+            state, request_id = await prepare_turn(pool, request, self.user_id)
+            agen = stream_agent(
+                state,
+                request_id,
+                pool,
+                state["project_id"],
+                encode=lambda event, data: ws_frame(turn_id, event, data),
+            )
+            async for frame in agen:
+                try:
+                    await self.send(frame)
+                except (WebSocketDisconnect, RuntimeError) as e:
+                    # Client went away mid-turn (starlette raises RuntimeError once the socket is closed).
+                    # The receive loop may not have noticed yet, so stop the stream here.
+                    self.connected = False
+                    logger.info(f"[ws:{turn_id}] send failed, socket closed: {e!r}")
+                    await _cancel_stream(agen)
+                    return
+        except HTTPException as e:
+            await self.send(ws_frame(turn_id, "error", {"message": e.detail, "code": "forbidden"}))
+            await self.send(ws_frame(turn_id, "done", {}))
+        except asyncio.CancelledError:
+            # Cancelled while sending rather than inside stream_agent.
+            await _cancel_stream(agen)
+            if turn_id in self.cancel_requested:
+                await self.send(ws_frame(turn_id, "done", {"cancelled": True}))
+            raise
+        except Exception as e:
+            # prepare_turn failures (e.g. DB errors); stream_agent reports its own errors in-band.
+            logger.error(f"[ws:{turn_id}] turn failed: {e}")
+            try:
+                await self.send(ws_frame(turn_id, "error", {"message": str(e), "code": "stream_error"}))
+                await self.send(ws_frame(turn_id, "done", {}))
+            except Exception:
+                pass
+        finally:
+            self.turns.pop(turn_id, None)
+            self.cancel_requested.discard(turn_id)
+
+    async def handle(self, message: Any) -> None:
+        if not isinstance(message, dict):
+            await self.send(ws_frame(None, "error", {"message": "Expected JSON object", "code": "invalid_frame"}))
+            return
+
+        kind = message.get("type")
+        turn_id = message.get("turn_id")
+        if not isinstance(turn_id, str) or not turn_id:
+            await self.send(ws_frame(None, "error", {"message": "turn_id required", "code": "invalid_frame"}))
+            return
+
+        if kind == "cancel":
+            task = self.turns.get(turn_id)
+            if task:
+                self.cancel_requested.add(turn_id)
+                task.cancel()
+            return
+
+        if kind != "chat":
+            await self.send(ws_frame(turn_id, "error", {"message": f"Unknown frame type: {kind}", "code": "invalid_frame"}))
+            return
+
+        if time.time() > self.expires_at:
+            await self.send(ws_frame(turn_id, "error", {"message": "Token expired", "code": "token_expired"}))
+            await self.send(ws_frame(turn_id, "done", {}))
+            return
+        if turn_id in self.turns:
+            await self.send(ws_frame(turn_id, "error", {"message": "turn_id already active", "code": "duplicate_turn"}))
+            return
+        if len(self.turns) >= MAX_CONCURRENT_TURNS:
+            await self.send(ws_frame(turn_id, "error", {"message": "Too many concurrent turns", "code": "too_many_turns"}))
+            await self.send(ws_frame(turn_id, "done", {}))
+            return
+
+        try:
+            request = ChatRequest.model_validate({k: v for k, v in message.items() if k not in ("type", "turn_id")})
+        except ValidationError as e:
+            await self.send(ws_frame(turn_id, "error", {"message": str(e), "code": "invalid_request"}))
+            await self.send(ws_frame(turn_id, "done", {}))
+            return
+
+        self.turns[turn_id] = asyncio.create_task(self.run_turn(turn_id, request))
+
+    async def close(self) -> None:
+        """Client went away: cancel in-flight turns and wait for their persistence to finish."""
+        self.connected = False
+        tasks = list(self.turns.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _authenticate(websocket: WebSocket) -> dict | None:
+    """Read the auth frame and return the token's claims, or close the socket and return None."""
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), timeout=AUTH_TIMEOUT_S)
+    except WebSocketDisconnect:
+        return None
+    # KeyError/TypeError: starlette's receive_json on a binary frame (no "text", or text=None).
+    except (asyncio.TimeoutError, json.JSONDecodeError, KeyError, TypeError):
+        await websocket.close(code=WS_POLICY_VIOLATION, reason="Authentication required")
+        return None
+
+    token = message.get("token") if isinstance(message, dict) and message.get("type") == "auth" else None
+    if not isinstance(token, str) or not token:
+        await websocket.close(code=WS_POLICY_VIOLATION, reason="Authentication required")
+        return None
+
+    # Same JWT rules as verify_token.
+    try:
+        return decode_token(token)
+    except jwt.ExpiredSignatureError:
+        await websocket.close(code=WS_POLICY_VIOLATION, reason="Token expired")
+    except jwt.InvalidTokenError:
+        await websocket.close(code=WS_POLICY_VIOLATION, reason="Invalid token")
+    return None
+
+
+@router.websocket("/ws")
+async def ws(websocket: WebSocket):
+    # CORSMiddleware does not cover WebSockets; apply the same origin allow-list here.
+    origin = websocket.headers.get("origin")
+    if origin and origin not in settings.CORS_ORIGINS:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    # The token travels in the first frame, not the URL, so it never lands in access logs.
+    claims = await _authenticate(websocket)
+    if claims is None:
+        return
+    user_id = claims["sub"]
+
+    mux = TurnMux(websocket, user_id, expires_at=claims["exp"] + JWT_LEEWAY_S)
+    await mux.send(ws_frame(None, "ready", {}))
+    logger.info(f"ws connected | user_id={user_id}")
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except (json.JSONDecodeError, KeyError, TypeError):
+                # KeyError/TypeError: starlette's receive_json on a binary frame.
+                await mux.send(ws_frame(None, "error", {"message": "Expected a JSON text frame", "code": "invalid_frame"}))
+                continue
+            await mux.handle(message)
+    except WebSocketDisconnect:
+        logger.info(f"ws disconnected | user_id={user_id} | active_turns={len(mux.turns)}")
+    finally:
+        await mux.close()
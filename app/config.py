@@ -1,7 +1,8 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List
 from dotenv import load_dotenv
+from app.agents.face.prompts import SPECIALIST_ALLOWED_MODELS
 
 load_dotenv()
 
@@ -16,6 +17,19 @@ class Settings:
     CORS_ORIGINS: List[str]
     # Bundle C: optional n8n webhook URL for generation tool. Must NOT hard-fail startup.
     N8N_WEBHOOK_URL: str | None = None
+    # Routes whose generate call carries prompt/amount/model directly (no specialist LLM call).
+    SINGLE_SHOT_ROUTES: List[str] = field(default_factory=list)
+    # Opt-in: directory for per-turn JSONL traces (see app/trace.py). Unset disables recording.
+    TRACE_DIR: str | None = None
+    # Opt-in hedging for the agent node (see app/agents/face/hedge.py). Unset disables hedging.
+    HEDGE_AFTER_MS: int | None = None
+    # Model for the hedge request; defaults to MODEL_NAME.
+    HEDGE_MODEL: str | None = None
+    # Max fraction of recent agent requests allowed to hedge.
+    HEDGE_MAX_RATE: float = 0.05
+    # Warm-up slots staged by POST /projects/{id}/warm for the next /chat turn.
+    WARM_TTL_S: float = 30.0
+    WARM_MAX_SLOTS: int = 256
 
 def _required(name: str) -> str:
     v = os.getenv(name)
@@ -35,6 +49,11 @@ def _load_settings() -> Settings:
     if "*" in cors_origins:
         raise ValueError("CORS_ORIGINS must not contain '*' when using credentials/auth")
 
+    single_shot_routes = [r.strip() for r in os.getenv("SINGLE_SHOT_ROUTES", "").split(",") if r.strip()]
+    unknown_routes = [r for r in single_shot_routes if r not in SPECIALIST_ALLOWED_MODELS]
+    if unknown_routes:
+        raise ValueError(f"SINGLE_SHOT_ROUTES contains unknown routes: {','.join(unknown_routes)}")
+
     return Settings(
         # Existing
         MODEL_NAME=os.getenv("MODEL_NAME", "gpt-4o"),
@@ -47,6 +66,14 @@ def _load_settings() -> Settings:
         CORS_ORIGINS=cors_origins,
         # Bundle C: optional. If missing, generate tool returns {ok:false,error_code:"missing_webhook_url",...}
         N8N_WEBHOOK_URL=os.getenv("N8N_WEBHOOK_URL"),
+        # Optional comma-separated subset of t2i,i2i,m2i,i2v. Empty keeps the two-call specialist flow.
+        SINGLE_SHOT_ROUTES=single_shot_routes,
+        TRACE_DIR=os.getenv("TRACE_DIR") or None,
+        HEDGE_AFTER_MS=int(os.getenv("HEDGE_AFTER_MS")) if os.getenv("HEDGE_AFTER_MS") else None,
+        HEDGE_MODEL=os.getenv("HEDGE_MODEL") or None,
+        HEDGE_MAX_RATE=float(os.getenv("HEDGE_MAX_RATE", "0.05")),
+        WARM_TTL_S=float(os.getenv("WARM_TTL_S", "30")),
+        WARM_MAX_SLOTS=int(os.getenv("WARM_MAX_SLOTS", "256")),
     )
 
 settings = _load_settings()
@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+from typing import Callable
+from langchain_core.messages import BaseMessage
+from app.config import settings
+
+
+class WarmCache:
+    """Short-TTL, size-bounded slots of pre-rendered context, one per (user_id, project_id).
+
+    Slots are single-use: take() removes the slot, so a staged context never outlives the turn
+    that consumed it. Oldest slots are evicted once max_slots is reached.
+
+    Every chat message write calls invalidate(project_id), dropping that project's slots. A warm-up
+    passes the version() it read before loading history to put(), which refuses to stage the
+    context if the project was written to in between.
+    """
+
+    def __init__(self, ttl_s: float, max_slots: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl_s = ttl_s
+        self.max_slots = max_slots
+        self.clock = clock
+        self._slots: OrderedDict[tuple[str, str], tuple[float, list[BaseMessage]]] = OrderedDict()
+        # Write stamps per project, bounded; anything evicted is covered by _write_floor.
+        self._seq = 0
+        self._writes: OrderedDict[str, int] = OrderedDict()
+        self._write_floor = 0
+
+    def version(self) -> int:
+        return self._seq
+
+    def put(self, user_id: str, project_id: str, context: list[BaseMessage], version: int) -> bool:
+        """Stage context loaded at `version`. Returns False if the project was written to since."""
+        if self._writes.get(project_id, self._write_floor) > version:
+            return False
+        key = (user_id, project_id)
+        self._slots.pop(key, None)
+        self._slots[key] = (self.clock() + self.ttl_s, context)
+        self._evict()
+        return True
+
+    def take(self, user_id: str, project_id: str) -> list[BaseMessage] | None:
+        slot = self._slots.pop((user_id, project_id), None)
+        if slot is None:
+            return None
+        expires, context = slot
+        if expires <= self.clock():
+            return None
+        return context
+
+    def invalidate(self, project_id: str) -> None:
+        self._seq += 1
+        self._writes.pop(project_id, None)
+        self._writes[project_id] = self._seq
+        while len(self._writes) > self.max_slots * 4:
+            _, stamp = self._writes.popitem(last=False)
+            self._write_floor = max(self._write_floor, stamp)
+        for key in [k for k in self._slots if k[1] == project_id]:
+            del self._slots[key]
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _evict(self) -> None:
+        now = self.clock()
+        for key in [k for k, (expires, _) in self._slots.items() if expires <= now]:
+            del self._slots[key]
+        while len(self._slots) > self.max_slots:
+            self._slots.popitem(last=False)
+
+
+warm_cache = WarmCache(ttl_s=settings.WARM_TTL_S, max_slots=settings.WARM_MAX_SLOTS)
@@ -1,6 +1,12 @@
 import asyncpg
 from typing import List
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from app.config import settings
+from app.db.cache import warm_cache
+from app.agents.face.prompts import build_system_prompt
+
+# Chat history window loaded into model context (roles user/assistant only).
+HISTORY_LIMIT = 50
 
 async def verify_project_ownership(conn: asyncpg.Connection, project_id: str, user_id: str) -> bool:
     row = await conn.fetchrow(
@@ -14,8 +20,10 @@ async def add_user_message(conn: asyncpg.Connection, project_id: str, user_id: s
         "INSERT INTO public.project_chat_messages (project_id, user_id, role, content) VALUES ($1, $2, 'user', $3)",
         project_id, user_id, content
     )
+    # Staged warm-up history for this project no longer matches Postgres.
+    warm_cache.invalidate(project_id)
 
-async def get_messages(conn: asyncpg.Connection, project_id: str, limit: int = 50) -> List[BaseMessage]:
+async def get_messages(conn: asyncpg.Connection, project_id: str, limit: int = HISTORY_LIMIT) -> List[BaseMessage]:
     """
     Read the most recent N messages (roles: user/assistant) and return them oldest -> newest.
     System prompt is injected in-memory and is never read from Postgres.
@@ -43,6 +51,10 @@ async def get_messages(conn: asyncpg.Connection, project_id: str, limit: int = 5
             messages.append(AIMessage(content=content))
     return messages
 
+def render_context(history: List[BaseMessage]) -> List[BaseMessage]:
+    # Inject the system prompt in-memory only; never store it in Postgres.
+    return [SystemMessage(content=build_system_prompt(settings.SINGLE_SHOT_ROUTES))] + history
+
 async def add_assistant_message(conn: asyncpg.Connection, project_id: str, content: str) -> None:
     """Persist assistant response. user_id is NULL for assistant rows."""
     await conn.execute(
@@ -50,3 +62,4 @@ async def add_assistant_message(conn: asyncpg.Connection, project_id: str, conte
         project_id,
         content,
     )
+    warm_cache.invalidate(project_id)
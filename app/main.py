@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.chat import router as chat_router
+from app.api.ws import router as ws_router
+from app.api.warm import router as warm_router
 
 from contextlib import asynccontextmanager
 from app.db.postgres import create_db_pool
@@ -24,6 +26,8 @@ app.add_middleware(
 )
 
 app.include_router(chat_router)
+app.include_router(ws_router)
+app.include_router(warm_router)
 
 
 @app.get("/health")
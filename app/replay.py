@@ -0,0 +1,236 @@
+"""Offline replay profiler for traces recorded by app/trace.py.
+
+Usage: python -m app.replay traces-YYYYMMDD.jsonl [--limit N] [--top N]
+
+Each trace is fed through the real stream_agent with a fake chat model that re-emits the
+recorded chunks at their recorded offsets. Tool calls are not re-executed: their recorded
+duration shows up as the gap between chunks. Replay never writes trace files.
+
+Per stage (graph nodes "agent"/"tools", graph overhead and persistence) it reports recorded vs
+replayed wall time and a cProfile of the replay; tracemalloc covers the whole turn.
+"""
+import io
+import time
+import pstats
+import asyncio
+import argparse
+import cProfile
+import tracemalloc
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.api.chat import stream_agent
+from app.agents.face.state import FaceAgentState
+from app.trace import TraceRecorder, load_traces
+from app.agents.face.hedge import AGENT_TOKEN_EVENT
+
+_STREAM_EVENTS = ("on_chat_model_stream", "on_llm_stream")
+# Node names from build_face_graph; everything else inside the graph run counts as "graph".
+_NODES = ("agent", "tools")
+_GRAPH = "LangGraph"
+
+
+class ReplayChatModel(BaseChatModel):
+    """Fake model that reproduces recorded chunk sizes and timing."""
+
+    # (offset seconds from replay start, content)
+    schedule: list[tuple[float, str]]
+    started: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ReplayChatModel":
+        # Replay never emits tool calls, so tools are accepted and ignored.
+        return self
+
+    def _generate(self, messages: list[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        text = "".join(content for _, content in self.schedule)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(self, messages: list[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for offset, content in self.schedule:
+            delay = offset - (time.perf_counter() - self.started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=content))
+
+
+class _NullConnection:
+    async def execute(self, *args: Any) -> None:
+        return None
+
+
+class _NullPool:
+    """Stands in for asyncpg.Pool so replay never touches Postgres."""
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield _NullConnection()
+
+
+def _message_from_shape(shape: dict) -> BaseMessage:
+    text = "x" * shape.get("chars", 0)
+    if shape.get("type") == "system":
+        return SystemMessage(content=text)
+    if shape.get("type") == "ai":
+        return AIMessage(content=text)
+    if not shape.get("images"):
+        return HumanMessage(content=text)
+    content = [{"type": "text", "text": text}]
+    for i in range(shape["images"]):
+        content.append({"type": "image_url", "image_url": {"url": f"https://replay.invalid/{i}.jpg"}})
+    return HumanMessage(content=content)
+
+
+def build_state(trace: dict) -> FaceAgentState:
+    recorded = trace["state"]
+    return {
+        "messages": [_message_from_shape(s) for s in recorded["messages"]],
+        "project_id": "replay",
+        "selected_ids": [f"replay-{i}" for i in range(recorded.get("selection_count", 0))],
+        "thumb_urls": [f"https://replay.invalid/{i}.jpg" for i in range(recorded.get("thumb_urls", 0))],
+        "selection_count": recorded.get("selection_count", 0),
+        "requested_aspect": recorded.get("requested_aspect"),
+        "client_model": recorded.get("client_model"),
+    }
+
+
+def build_schedule(trace: dict) -> list[tuple[float, str]]:
+    # Event rows are [t_ms, event, name, run, size].
+    return [
+        (row[0] / 1000, "x" * row[4])
+        for row in trace["events"]
+        if row[4] and (row[1] in _STREAM_EVENTS or (row[1] == "on_custom_event" and row[2] == AGENT_TOKEN_EVENT))
+    ]
+
+
+def stage_wall_ms(events: list[list], elapsed_ms: float) -> dict[str, float]:
+    """Wall time per stage from [t_ms, event, name, run, size] rows: graph nodes, then persistence
+    (graph end until the turn finished). Works on recorded and replayed rows alike."""
+    stages: dict[str, float] = {}
+    opened: dict[int, float] = {}
+    graph_end = None
+    for t_ms, kind, name, run, _ in events:
+        if name in _NODES and kind == "on_chain_start":
+            opened[run] = t_ms
+        elif name in _NODES and kind == "on_chain_end" and run in opened:
+            stages[name] = round(stages.get(name, 0.0) + t_ms - opened.pop(run), 2)
+        elif name == _GRAPH and kind == "on_chain_end":
+            graph_end = t_ms
+    if graph_end is not None:
+        stages["persist"] = round(elapsed_ms - graph_end, 2)
+    return stages
+
+
+class StageProfiler(TraceRecorder):
+    """In-memory recorder for a replayed turn that also switches cProfile at stage boundaries.
+
+    Passed to stream_agent as its recorder, so replay never appends to the trace files (which may
+    be the very file being replayed). Stages follow the consumed astream_events: a graph node
+    ("agent"/"tools") from its start to its end, "graph" for the rest of the graph run and
+    "persist" from graph end until finish().
+    """
+
+    def __init__(self, state: FaceAgentState):
+        super().__init__("", "replay", state)
+        self.profilers: dict[str, cProfile.Profile] = {}
+        self.status: str | None = None
+        self.elapsed_ms = 0.0
+        self._active: cProfile.Profile | None = None
+
+    def _switch(self, stage: str | None) -> None:
+        if self._active:
+            self._active.disable()
+        self._active = self.profilers.setdefault(stage, cProfile.Profile()) if stage else None
+        if self._active:
+            self._active.enable()
+
+    def start(self) -> None:
+        self._switch("graph")
+
+    def on_event(self, event: dict, content: str = "") -> None:
+        super().on_event(event, content)
+        kind, name = event.get("event"), event.get("name")
+        if name in _NODES and kind == "on_chain_start":
+            self._switch(name)
+        elif name in _NODES and kind == "on_chain_end":
+            self._switch("graph")
+        elif name == _GRAPH and kind == "on_chain_end":
+            self._switch("persist")
+
+    async def finish(self, status: str) -> None:
+        self._switch(None)
+        self.status = status
+        self.elapsed_ms = self._elapsed_ms()
+
+
+async def _drain(state: FaceAgentState, model: ReplayChatModel, request_id: str, profiler: StageProfiler) -> tuple[int, float | None]:
+    events = 0
+    first_token: float | None = None
+    model.started = time.perf_counter()
+    profiler.start()
+    try:
+        async for sse in stream_agent(state, request_id, _NullPool(), "replay", llm=model, recorder=profiler):
+            events += 1
+            if first_token is None and sse.startswith("event: token"):
+                first_token = time.perf_counter() - model.started
+    finally:
+        profiler._switch(None)
+    return events, first_token
+
+
+def _print_profile(stage: str, profiler: cProfile.Profile, top: int) -> None:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+    print(f"--- stage={stage} profile")
+    print(out.getvalue().strip())
+
+
+def replay(path: str, limit: int | None = None, top: int = 15) -> None:
+    traces = load_traces(path)[:limit]
+    for trace in traces:
+        request_id = trace.get("request_id", "replay")
+        print(f"=== [{request_id}] status={trace.get('status')} recorded={trace.get('elapsed_ms')}ms")
+        state = build_state(trace)
+        model = ReplayChatModel(schedule=build_schedule(trace))
+        profiler = StageProfiler(state)
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        try:
+            events, first_token = asyncio.run(_drain(state, model, request_id, profiler))
+        finally:
+            after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        recorded = stage_wall_ms(trace.get("events", []), trace.get("elapsed_ms") or 0.0)
+        replayed = stage_wall_ms(profiler.events, profiler.elapsed_ms)
+        for stage in sorted(set(recorded) | set(replayed)):
+            print(f"--- stage={stage} recorded={recorded.get(stage, 'n/a')}ms replayed={replayed.get(stage, 'n/a')}ms")
+        for stage, stage_profiler in profiler.profilers.items():
+            _print_profile(stage, stage_profiler, top)
+        print("--- top allocations")
+        for stat in after.compare_to(before, "lineno")[:top]:
+            print(f"  {stat}")
+
+        ttft = f"{first_token * 1000:.1f}ms" if first_token is not None else "n/a"
+        print(f"=== [{request_id}] sse_events={events} ttft={ttft} replayed={profiler.elapsed_ms}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded chat traces under cProfile and tracemalloc.")
+    parser.add_argument("path", help="JSONL trace file written by TraceRecorder")
+    parser.add_argument("--limit", type=int, default=None, help="Replay at most N traces")
+    parser.add_argument("--top", type=int, default=15, help="Rows per profile/allocation report")
+    args = parser.parse_args()
+    replay(args.path, limit=args.limit, top=args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import asyncio
+from datetime import datetime, timezone
+from langchain_core.messages import BaseMessage
+
+from app.logging import get_logger
+from app.agents.face.graph import parse_tool_result
+
+logger = get_logger("trace")
+
+
+def message_shape(message: BaseMessage) -> dict:
+    """Redacted description of a message: type, text size and image count, never the content itself."""
+    content = message.content
+    if isinstance(content, str):
+        return {"type": message.type, "chars": len(content), "images": 0}
+    chars = 0
+    images = 0
+    for part in content:
+        if isinstance(part, dict) and part.get("type") == "image_url":
+            images += 1
+        elif isinstance(part, dict):
+            chars += len(part.get("text") or "")
+        elif isinstance(part, str):
+            chars += len(part)
+    return {"type": message.type, "chars": chars, "images": images}
+
+
+class TraceRecorder:
+    """Opt-in recorder for one chat turn (enabled by TRACE_DIR).
+
+    Captures the redacted FaceAgentState, per-event timings from astream_events and
+    generate tool inputs/outputs, then appends a single JSON line on finish().
+    """
+
+    def __init__(self, trace_dir: str, request_id: str, state: dict):
+        self.trace_dir = trace_dir
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.state = {
+            "messages": [message_shape(m) for m in state["messages"]],
+            "selection_count": state.get("selection_count", 0),
+            "thumb_urls": len(state.get("thumb_urls") or []),
+            "requested_aspect": state.get("requested_aspect"),
+            "client_model": state.get("client_model"),
+        }
+        # Compact rows: [t_ms, event, name, run_id index, size]
+        self.events: list[list] = []
+        self.tools: list[dict] = []
+        self._run_ids: dict[str, int] = {}
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 2)
+
+    def on_event(self, event: dict, content: str = "") -> None:
+        kind = event.get("event")
+        name = event.get("name")
+        run_id = str(event.get("run_id", ""))
+        run = self._run_ids.setdefault(run_id, len(self._run_ids))
+        self.events.append([self._elapsed_ms(), kind, name, run, len(content)])
+
+        if name != "generate":
+            return
+        data = event.get("data") or {}
+        if kind == "on_tool_start":
+            tool_input = data.get("input") if isinstance(data.get("input"), dict) else {}
+            self.tools.append({
+                "t_ms": self._elapsed_ms(),
+                "route": tool_input.get("route"),
+                "intent_chars": len(tool_input.get("intent") or ""),
+            })
+        elif kind == "on_tool_end" and self.tools:
+            self.tools[-1]["output"] = parse_tool_result(data.get("output"))
+            self.tools[-1]["duration_ms"] = round(self._elapsed_ms() - self.tools[-1]["t_ms"], 2)
+
+    async def finish(self, status: str) -> None:
+        """Append the trace as one JSON line off the event loop. Never raises; tracing must not break a turn."""
+        record = {
+            "request_id": self.request_id,
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "status": status,
+            "elapsed_ms": self._elapsed_ms(),
+            "state": self.state,
+            "events": self.events,
+            "tools": self.tools,
+        }
+        try:
+            await asyncio.to_thread(self._write, json.dumps(record, separators=(",", ":")))
+        except Exception as e:
+            logger.error(f"[{self.request_id}] failed to write trace: {e}")
+
+    def _write(self, line: str) -> None:
+        day = datetime.now(timezone.utc).strftime("%Y%m%d")
+        os.makedirs(self.trace_dir, exist_ok=True)
+        with open(os.path.join(self.trace_dir, f"traces-{day}.jsonl"), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def load_traces(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -1,5 +1,10 @@
+import asyncio
 import pytest
+from contextlib import asynccontextmanager
 from fastapi.testclient import TestClient
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from app.main import app
 from app.api.deps import verify_token
 
@@ -11,3 +16,83 @@ def client():
         yield TestClient(app)
     finally:
         app.dependency_overrides.clear()
+
+
+class FakeConnection:
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+
+    async def fetchrow(self, query, *args):
+        self.pool.queries.append((query, args))
+        return {"?column?": 1} if self.pool.owned else None
+
+    async def fetch(self, query, *args):
+        self.pool.queries.append((query, args))
+        # get_messages orders newest first.
+        return list(reversed(self.pool.history))
+
+    async def execute(self, query, *args):
+        self.pool.queries.append((query, args))
+
+
+class FakePool:
+    """Stands in for asyncpg.Pool and records every query it receives."""
+
+    def __init__(self):
+        self.owned = True
+        # Rows oldest -> newest, as {"role", "content"} dicts.
+        self.history: list[dict] = []
+        self.queries: list[tuple[str, tuple]] = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self)
+
+    def count(self, fragment: str) -> int:
+        return sum(fragment in q for q, _ in self.queries)
+
+    def assistant_rows(self) -> list[str]:
+        return [args[1] for q, args in self.queries if "NULL, 'assistant'" in q]
+
+
+@pytest.fixture
+def fake_pool():
+    pool = FakePool()
+    app.state.db_pool = pool
+    try:
+        yield pool
+    finally:
+        del app.state.db_pool
+
+
+class SlowChatModel(BaseChatModel):
+    """Fake streaming model: replies "<last input>-0 <last input>-1 ..." one chunk every `delay` seconds."""
+
+    chunks: int = 5
+    delay: float = 0.02
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages) -> list[str]:
+        return [f"{messages[-1].content}-{i} " for i in range(self.chunks)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._reply(messages))))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for part in self._reply(messages):
+            await asyncio.sleep(self.delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=part))
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Make stream_agent use SlowChatModel instead of OpenAI. Mutate the returned dict to tune it."""
+    opts = {"chunks": 5, "delay": 0.02}
+    monkeypatch.setattr("app.api.chat.ChatOpenAI", lambda **kwargs: SlowChatModel(**opts))
+    return opts
@@ -2,6 +2,7 @@ import pytest
 import jwt
 import time
 from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
 from app.main import app
 from app.config import settings
 from app.api.deps import verify_token
@@ -47,3 +48,30 @@ def test_wrong_issuer(auth_client):
     token = create_token(iss="https://wrong/iss")
     r = auth_client.post("/chat", headers={"Authorization": f"Bearer {token}"}, json={})
     assert r.status_code == 401
+
+def ws_auth(auth_client, token):
+    with auth_client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "auth", "token": token})
+        try:
+            return ws.receive_json()
+        except WebSocketDisconnect as e:
+            return e.code
+
+def test_ws_valid_token(auth_client):
+    assert ws_auth(auth_client, create_token()) == {"turn_id": None, "event": "ready", "data": {}}
+
+def test_ws_expired_token(auth_client):
+    assert ws_auth(auth_client, create_token(exp_seconds=-100)) == 1008
+
+def test_ws_wrong_audience(auth_client):
+    assert ws_auth(auth_client, create_token(aud="wrong")) == 1008
+
+def test_ws_invalid_chat_frame(auth_client):
+    with auth_client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "auth", "token": create_token()})
+        assert ws.receive_json()["event"] == "ready"
+        # Missing project_id: the turn fails validation without touching the DB.
+        ws.send_json({"type": "chat", "turn_id": "t1", "chatInput": "hi"})
+        error = ws.receive_json()
+        assert (error["turn_id"], error["event"], error["data"]["code"]) == ("t1", "error", "invalid_request")
+        assert ws.receive_json() == {"turn_id": "t1", "event": "done", "data": {}}
@@ -64,3 +64,20 @@ def test_normalization_endpoint_422(client):
     payload = {"project_id": "p", "chatInput": "i", "selected_ids": '{"a":1}'}
     response = client.post("/chat", json=payload)
     assert response.status_code == 422
+
+
+def test_tool_event_to_sse():
+    from langchain_core.messages import ToolMessage
+    from app.api.chat import tool_event_to_sse
+
+    start = tool_event_to_sse({"event": "on_tool_start", "name": "generate", "data": {"input": {"route": "i2v", "intent": "x"}}})
+    assert parse_sse(start.splitlines()) == [("tool_start", {"name": "generate", "route": "i2v", "video": True})]
+
+    progress = tool_event_to_sse({"event": "on_custom_event", "name": "tool_progress", "data": {"stage": "webhook", "route": "t2i", "video": False}})
+    assert parse_sse(progress.splitlines()) == [("tool_progress", {"name": "generate", "stage": "webhook", "route": "t2i", "video": False})]
+
+    output = ToolMessage(content=json.dumps({"ok": True, "route": "t2i", "video": False, "amount": 1, "model": "gpt4o_image"}), tool_call_id="c1")
+    end = tool_event_to_sse({"event": "on_tool_end", "name": "generate", "data": {"output": output}})
+    assert parse_sse(end.splitlines()) == [("tool_end", {"name": "generate", "ok": True, "route": "t2i", "video": False, "amount": 1, "model": "gpt4o_image"})]
+
+    assert tool_event_to_sse({"event": "on_chain_start", "name": "agent", "data": {}}) is None
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import pytest
+import httpx
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from app.config import settings, _load_settings
+from app.agents.face import graph as face_graph
+from app.agents.face.prompts import SYSTEM_PROMPT, build_system_prompt
+
+
+STATE = {
+    "messages": [],
+    "project_id": "p",
+    "selected_ids": ["a"],
+    "thumb_urls": [],
+    "selection_count": 1,
+    "requested_aspect": None,
+}
+
+
+class FakeResponse:
+    status_code = 200
+
+
+class FakeAsyncClient:
+    posted: list[dict] = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def post(self, url, json=None):
+        FakeAsyncClient.posted.append(json)
+        return FakeResponse()
+
+
+@pytest.fixture
+def single_shot(monkeypatch):
+    FakeAsyncClient.posted = []
+    monkeypatch.setattr(settings, "N8N_WEBHOOK_URL", "http://n8n.test/hook")
+    monkeypatch.setattr(settings, "SINGLE_SHOT_ROUTES", ["t2i"])
+    monkeypatch.setattr(httpx, "AsyncClient", FakeAsyncClient)
+
+    async def fail_specialist(route, intent):
+        raise AssertionError("specialist must not be called for single-shot routes")
+
+    monkeypatch.setattr(face_graph, "_run_specialist", fail_specialist)
+
+
+def run_single_shot(**kwargs) -> dict:
+    # Go through the bound tool so its args schema is exercised exactly as ToolNode would.
+    tool = face_graph.build_generate_tool()
+    out = asyncio.run(tool.ainvoke({"route": "t2i", "intent": "a cat", "state": STATE, **kwargs}))
+    return json.loads(out)
+
+
+def test_single_shot_skips_specialist(single_shot):
+    result = run_single_shot(prompt="a photo of a cat", amount=2, model="gpt4o_image")
+    assert result == {"ok": True, "route": "t2i", "video": False, "amount": 2, "model": "gpt4o_image"}
+    assert FakeAsyncClient.posted[0]["prompt"] == "a photo of a cat"
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"prompt": "x", "amount": 1, "model": "veo_fast"},  # model not allowed for route
+        {"prompt": "x", "amount": 0, "model": "gpt4o_image"},
+        {"prompt": "x", "amount": "two", "model": "gpt4o_image"},
+        {"prompt": "x", "amount": 1.5, "model": "gpt4o_image"},
+        {"prompt": "x", "amount": True, "model": "gpt4o_image"},
+        {"prompt": " ", "amount": 1, "model": "gpt4o_image"},
+        {},  # fields missing
+    ],
+)
+def test_single_shot_validation_errors(single_shot, fields):
+    result = run_single_shot(**fields)
+    assert result == {"ok": False, "error_code": "specialist_parse_error", "route": "t2i", "video": False}
+    assert FakeAsyncClient.posted == []
+
+
+def test_build_generate_tool_schema(monkeypatch):
+    monkeypatch.setattr(settings, "SINGLE_SHOT_ROUTES", [])
+    tool = face_graph.build_generate_tool()
+    assert set(tool.tool_call_schema.model_json_schema()["properties"]) == {"route", "intent"}
+
+    monkeypatch.setattr(settings, "SINGLE_SHOT_ROUTES", ["t2i"])
+    tool = face_graph.build_generate_tool()
+    assert tool.name == "generate"
+    assert set(tool.tool_call_schema.model_json_schema()["properties"]) == {"route", "intent", "prompt", "amount", "model"}
+
+
+def test_single_shot_schema_is_typed_for_the_llm(monkeypatch):
+    # Validation is lenient server-side, but the model still sees types and constraints.
+    monkeypatch.setattr(settings, "SINGLE_SHOT_ROUTES", ["t2i", "i2i"])
+    params = convert_to_openai_tool(face_graph.build_generate_tool())["function"]["parameters"]
+    assert params["properties"]["prompt"]["type"] == "string"
+    assert params["properties"]["amount"]["type"] == "integer"
+    assert params["properties"]["amount"]["minimum"] == 1
+    assert params["properties"]["model"]["enum"] == ["gpt4o_image", "nano_banana", "nano_banana_pro"]
+    assert params["required"] == ["route", "intent"]
+    assert "state" not in params["properties"]
+
+
+def test_system_prompt_follows_single_shot_routes():
+    assert build_system_prompt([]) == SYSTEM_PROMPT
+    prompt = build_system_prompt(["t2i"])
+    assert "For route t2i also pass prompt" in prompt
+    assert prompt.startswith("You are a canvas assistant")
+
+
+def test_single_shot_routes_validated_at_load(monkeypatch):
+    monkeypatch.setenv("SINGLE_SHOT_ROUTES", "t2i,t2l")
+    with pytest.raises(ValueError, match="t2l"):
+        _load_settings()
+
+    monkeypatch.setenv("SINGLE_SHOT_ROUTES", " t2i , i2v ")
+    assert _load_settings().SINGLE_SHOT_ROUTES == ["t2i", "i2v"]
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import pytest
+from langchain_core.messages import AIMessageChunk
+from langchain_core.runnables import RunnableLambda
+from app.agents.face.hedge import HedgeStats, hedged_invoke
+
+
+class FakeProvider:
+    """Local fake streaming provider: first chunk after `delay(i)` seconds, then the rest immediately.
+
+    With `error` set, every request raises it after the delay instead of streaming.
+    """
+
+    def __init__(self, name: str, delay, error: Exception | None = None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.closed = 0
+        self.cancelled = 0
+
+    async def astream(self, messages, config=None):
+        delay = self.delay(self.calls)
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+            if self.error:
+                raise self.error
+            for part in (self.name, " ok"):
+                yield AIMessageChunk(content=part)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.closed += 1
+
+
+def run_turns(primary, secondary, turns, hedge_after, max_rate, stats):
+    async def turn(messages):
+        return await hedged_invoke(primary, secondary, messages, hedge_after, max_rate, stats=stats)
+
+    async def main():
+        # A parent run is needed so the agent_token custom events can be dispatched.
+        runnable = RunnableLambda(turn)
+        return [await runnable.ainvoke([]) for _ in range(turns)]
+
+    return asyncio.run(main())
+
+
+def test_hedge_cuts_p99_ttft(caplog):
+    # Every 20th primary request has a long-tail first token; the hedge provider is always fast.
+    def primary_delay(i):
+        return 0.25 if i % 20 == 19 else 0.005
+
+    # Unhedged baseline over the same request schedule.
+    baseline = HedgeStats(report_every=0)
+    run_turns(FakeProvider("primary", primary_delay), FakeProvider("hedge", lambda i: 0.005), 100, hedge_after=0.03, max_rate=0.0, stats=baseline)
+
+    primary = FakeProvider("primary", primary_delay)
+    secondary = FakeProvider("hedge", lambda i: 0.005)
+    stats = HedgeStats(report_every=50)
+
+    with caplog.at_level(logging.INFO, logger="hedge"):
+        results = run_turns(primary, secondary, 100, hedge_after=0.03, max_rate=0.1, stats=stats)
+
+    report = stats.snapshot()
+    assert report["hedge_rate"] == 0.05
+    assert report["hedge_wins"] == 5
+    # The unhedged run sees the 250ms tail; hedged TTFT does not.
+    unhedged_p99 = baseline.snapshot()["ttft_p99_ms"]
+    assert unhedged_p99 >= 250
+    assert report["ttft_p99_ms"] < unhedged_p99 / 2
+    # Periodic report.
+    assert sum("hedge stats |" in r.getMessage() for r in caplog.records) == 2
+    assert sum(r.content == "hedge ok" for r in results) == 5
+    # Losing primaries were cancelled as soon as the hedge won, not left running.
+    assert primary.cancelled == 5
+    assert primary.closed == primary.calls
+
+
+@pytest.mark.parametrize("hedge_delay", [0.0, 0.02])
+def test_failing_hedge_never_wins(hedge_delay):
+    # e.g. a bad HEDGE_MODEL that 404s immediately: the slower primary must still answer.
+    primary = FakeProvider("primary", lambda i: 0.1)
+    secondary = FakeProvider("hedge", lambda i: hedge_delay, error=RuntimeError("model not found"))
+    stats = HedgeStats()
+
+    results = run_turns(primary, secondary, 1, hedge_after=0.01, max_rate=1.0, stats=stats)
+
+    assert [r.content for r in results] == ["primary ok"]
+    report = stats.snapshot()
+    assert report["hedge_rate"] == 1.0
+    assert report["hedge_wins"] == 0
+    assert report["ttft_p99_ms"] >= 100
+    assert secondary.closed == 1
+
+
+def test_all_candidates_failing_raises():
+    primary = FakeProvider("primary", lambda i: 0.05, error=ValueError("primary down"))
+    secondary = FakeProvider("hedge", lambda i: 0.0, error=RuntimeError("model not found"))
+    stats = HedgeStats()
+
+    with pytest.raises(ValueError, match="primary down"):
+        run_turns(primary, secondary, 1, hedge_after=0.01, max_rate=1.0, stats=stats)
+
+    # Failures are not TTFT samples.
+    assert stats.snapshot()["ttft_p99_ms"] is None
+    assert primary.closed == secondary.closed == 1
+
+
+def test_hedge_rate_cap():
+    primary = FakeProvider("primary", lambda i: 0.05)
+    secondary = FakeProvider("hedge", lambda i: 0.0)
+    stats = HedgeStats()
+
+    results = run_turns(primary, secondary, 5, hedge_after=0.01, max_rate=0.0, stats=stats)
+
+    assert secondary.calls == 0
+    assert stats.snapshot()["hedge_rate"] == 0.0
+    assert all(r.content == "primary ok" for r in results)
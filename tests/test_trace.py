@@ -0,0 +1,85 @@
+import json
+import asyncio
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from app.config import settings
+from app.replay import replay, stage_wall_ms
+from app.trace import TraceRecorder, load_traces, message_shape
+
+
+def test_message_shape_is_redacted():
+    msg = HumanMessage(content=[
+        {"type": "text", "text": "secret"},
+        {"type": "image_url", "image_url": {"url": "https://x/1.jpg"}},
+    ])
+    assert message_shape(msg) == {"type": "human", "chars": 6, "images": 1}
+
+
+def test_recorder_writes_jsonl(tmp_path):
+    state = {
+        "messages": [SystemMessage(content="sys"), HumanMessage(content="hello")],
+        "project_id": "p",
+        "selected_ids": [],
+        "thumb_urls": [],
+        "selection_count": 0,
+    }
+    recorder = TraceRecorder(str(tmp_path), "abc", state)
+    recorder.on_event({"event": "on_chat_model_stream", "name": "ChatOpenAI", "run_id": "r1"}, "hi")
+    recorder.on_event({"event": "on_tool_start", "name": "generate", "run_id": "r2", "data": {"input": {"route": "t2i", "intent": "cat"}}})
+    output = ToolMessage(content=json.dumps({"ok": True, "route": "t2i", "video": False, "amount": 1, "model": "gpt4o_image"}), tool_call_id="c1")
+    recorder.on_event({"event": "on_tool_end", "name": "generate", "run_id": "r2", "data": {"output": output}})
+    asyncio.run(recorder.finish("done"))
+
+    [path] = list(tmp_path.iterdir())
+    [trace] = load_traces(str(path))
+    assert trace["request_id"] == "abc"
+    assert trace["status"] == "done"
+    assert trace["state"]["messages"] == [
+        {"type": "system", "chars": 3, "images": 0},
+        {"type": "human", "chars": 5, "images": 0},
+    ]
+    assert [row[1:] for row in trace["events"]] == [
+        ["on_chat_model_stream", "ChatOpenAI", 0, 2],
+        ["on_tool_start", "generate", 1, 0],
+        ["on_tool_end", "generate", 1, 0],
+    ]
+    assert trace["tools"][0]["route"] == "t2i"
+    assert trace["tools"][0]["intent_chars"] == 3
+    assert trace["tools"][0]["output"]["ok"] is True
+    assert "hello" not in path.read_text()
+
+
+RECORDED = {
+    "request_id": "r1",
+    "status": "done",
+    "elapsed_ms": 40,
+    "state": {"messages": [{"type": "system", "chars": 10, "images": 0}, {"type": "human", "chars": 5, "images": 0}]},
+    "events": [
+        [0, "on_chain_start", "LangGraph", 0, 0],
+        [1, "on_chain_start", "agent", 1, 0],
+        [5, "on_chat_model_stream", "ChatOpenAI", 2, 3],
+        [10, "on_chat_model_stream", "ChatOpenAI", 2, 3],
+        [20, "on_chain_end", "agent", 1, 0],
+        [30, "on_chain_end", "LangGraph", 0, 0],
+    ],
+    "tools": [],
+}
+
+
+def test_stage_wall_ms():
+    assert stage_wall_ms(RECORDED["events"], RECORDED["elapsed_ms"]) == {"agent": 19, "persist": 10}
+
+
+def test_replay_reports_stages_without_writing_traces(tmp_path, monkeypatch, capsys):
+    # Replaying with the production env must not append to today's (or the replayed) trace file.
+    monkeypatch.setattr(settings, "TRACE_DIR", str(tmp_path))
+    path = tmp_path / "traces-20260101.jsonl"
+    path.write_text(json.dumps(RECORDED) + "\n")
+
+    replay(str(path), top=3)
+
+    assert list(tmp_path.iterdir()) == [path]
+    assert len(load_traces(str(path))) == 1
+    out = capsys.readouterr().out
+    assert "--- stage=agent recorded=19.0ms replayed=" in out
+    assert "--- stage=persist recorded=10ms replayed=" in out
+    assert "--- stage=agent profile" in out
@@ -0,0 +1,119 @@
+import time
+import uuid
+import asyncio
+from langchain_core.messages import HumanMessage
+from app.db.cache import WarmCache, warm_cache
+from app.db.chat import add_assistant_message
+from tests.conftest import FakeConnection
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_take_is_single_use():
+    cache = WarmCache(ttl_s=30, max_slots=4, clock=FakeClock())
+    context = [HumanMessage(content="hi")]
+    assert cache.put("u", "p", context, cache.version())
+    assert cache.take("u", "p") is context
+    assert cache.take("u", "p") is None
+    # Slots are per user and project.
+    cache.put("u", "p", context, cache.version())
+    assert cache.take("other", "p") is None
+
+
+def test_expired_slot_falls_back():
+    clock = FakeClock()
+    cache = WarmCache(ttl_s=30, max_slots=4, clock=clock)
+    cache.put("u", "p", [], cache.version())
+    clock.now = 31
+    assert cache.take("u", "p") is None
+    assert len(cache) == 0
+
+
+def test_memory_bound_evicts_oldest():
+    cache = WarmCache(ttl_s=30, max_slots=2, clock=FakeClock())
+    for project in ("a", "b", "c"):
+        cache.put("u", project, [], cache.version())
+    assert len(cache) == 2
+    assert cache.take("u", "a") is None
+    assert cache.take("u", "c") == []
+
+
+def test_write_invalidates_project_slots():
+    cache = WarmCache(ttl_s=30, max_slots=4, clock=FakeClock())
+    cache.put("u1", "p", [], cache.version())
+    cache.put("u2", "p", [], cache.version())
+    cache.put("u1", "other", [], cache.version())
+    cache.invalidate("p")
+    assert cache.take("u1", "p") is None
+    assert cache.take("u2", "p") is None
+    assert cache.take("u1", "other") == []
+
+
+def test_write_during_warm_discards_snapshot():
+    cache = WarmCache(ttl_s=30, max_slots=4, clock=FakeClock())
+    version = cache.version()
+    # Another turn's reply lands while the warm-up is still loading history.
+    cache.invalidate("p")
+    assert cache.put("u", "p", [], version) is False
+    assert cache.take("u", "p") is None
+    # Writes to other projects do not affect it.
+    version = cache.version()
+    cache.invalidate("other")
+    assert cache.put("u", "p", [], version) is True
+
+
+def warm_and_chat(client, fake_pool, project_id):
+    r = client.post(f"/projects/{project_id}/warm")
+    assert r.status_code == 200
+    fake_pool.queries.clear()
+    with client.stream("POST", "/chat", json={"project_id": project_id, "chatInput": "hello"}) as response:
+        assert response.status_code == 200
+        body = "".join(response.iter_text())
+    assert "event: done" in body
+
+
+def test_warm_forbidden_for_foreign_project(client, fake_pool):
+    fake_pool.owned = False
+    project_id = str(uuid.uuid4())
+    r = client.post(f"/projects/{project_id}/warm")
+    assert r.status_code == 403
+    assert warm_cache.take("test-user-id", project_id) is None
+
+
+def test_chat_consumes_warm_slot(client, fake_pool, fake_llm):
+    fake_pool.history = [{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "reply"}]
+    warm_and_chat(client, fake_pool, str(uuid.uuid4()))
+    # Ownership and history were served from the slot; only the writes hit Postgres.
+    assert fake_pool.count("FROM public.projects") == 0
+    assert fake_pool.count("FROM public.project_chat_messages") == 0
+    assert fake_pool.count("'user'") == 1
+    assert fake_pool.count("'assistant'") == 1
+
+
+def test_chat_falls_back_after_expiry(client, fake_pool, fake_llm, monkeypatch):
+    project_id = str(uuid.uuid4())
+    assert client.post(f"/projects/{project_id}/warm").status_code == 200
+    monkeypatch.setattr(warm_cache, "clock", lambda: time.monotonic() + 3600)
+    fake_pool.queries.clear()
+    with client.stream("POST", "/chat", json={"project_id": project_id, "chatInput": "hello"}) as response:
+        "".join(response.iter_text())
+    assert fake_pool.count("FROM public.projects") == 1
+    assert fake_pool.count("FROM public.project_chat_messages") == 1
+
+
+def test_chat_falls_back_after_concurrent_write(client, fake_pool, fake_llm):
+    project_id = str(uuid.uuid4())
+    assert client.post(f"/projects/{project_id}/warm").status_code == 200
+    # e.g. a turn in another tab persists its reply after the warm-up snapshot.
+    asyncio.run(add_assistant_message(FakeConnection(fake_pool), project_id, "late reply"))
+    fake_pool.queries.clear()
+    with client.stream("POST", "/chat", json={"project_id": project_id, "chatInput": "hello"}) as response:
+        "".join(response.iter_text())
+    assert fake_pool.count("FROM public.projects") == 1
+    assert fake_pool.count("FROM public.project_chat_messages") == 1
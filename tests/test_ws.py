@@ -0,0 +1,176 @@
+import time
+import uuid
+import asyncio
+import pytest
+from types import SimpleNamespace
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from langchain_core.messages import HumanMessage
+from app.main import app
+from app.api import ws as ws_module
+from app.api.ws import TurnMux
+from tests.test_auth import create_token
+
+
+async def stub_prepare_turn(pool, request, user_id):
+    state = {
+        "messages": [HumanMessage(content=request.chatInput)],
+        "project_id": str(request.project_id),
+        "selected_ids": [],
+        "thumb_urls": [],
+        "selection_count": 0,
+    }
+    return state, "test"
+
+
+@pytest.fixture
+def ws_client(monkeypatch, fake_pool, fake_llm):
+    app.dependency_overrides.clear()
+    monkeypatch.setattr(ws_module, "prepare_turn", stub_prepare_turn)
+    return TestClient(app)
+
+
+def connect(ws):
+    ws.send_json({"type": "auth", "token": create_token()})
+    assert ws.receive_json()["event"] == "ready"
+
+
+def chat_frame(turn_id, text):
+    return {"type": "chat", "turn_id": turn_id, "project_id": str(uuid.uuid4()), "chatInput": text}
+
+
+def receive_until_done(ws, turn_ids):
+    frames = []
+    done = set()
+    while done != set(turn_ids):
+        frame = ws.receive_json()
+        frames.append(frame)
+        if frame["event"] == "done":
+            done.add(frame["turn_id"])
+    return frames
+
+
+def tokens(frames, turn_id):
+    return "".join(f["data"]["content"] for f in frames if f["turn_id"] == turn_id and f["event"] == "token")
+
+
+def test_ws_multiplexes_concurrent_turns(ws_client, fake_pool):
+    with ws_client.websocket_connect("/ws") as ws:
+        connect(ws)
+        ws.send_json(chat_frame("t1", "a"))
+        ws.send_json(chat_frame("t2", "b"))
+        frames = receive_until_done(ws, ["t1", "t2"])
+
+    assert tokens(frames, "t1") == "a-0 a-1 a-2 a-3 a-4 "
+    assert tokens(frames, "t2") == "b-0 b-1 b-2 b-3 b-4 "
+    # Both turns stream at the same time: t2 emits tokens before t1 finishes.
+    first_t2_token = next(i for i, f in enumerate(frames) if f["turn_id"] == "t2" and f["event"] == "token")
+    t1_done = next(i for i, f in enumerate(frames) if f["turn_id"] == "t1" and f["event"] == "done")
+    assert first_t2_token < t1_done
+    assert [f["data"] for f in frames if f["event"] == "done"] == [{}, {}]
+    assert sorted(fake_pool.assistant_rows()) == ["a-0 a-1 a-2 a-3 a-4 ", "b-0 b-1 b-2 b-3 b-4 "]
+
+
+def test_ws_cancel_persists_partial(ws_client, fake_pool, fake_llm):
+    fake_llm["chunks"] = 50
+    with ws_client.websocket_connect("/ws") as ws:
+        connect(ws)
+        ws.send_json(chat_frame("t1", "c"))
+        first = ws.receive_json()
+        assert (first["turn_id"], first["event"]) == ("t1", "token")
+        ws.send_json({"type": "cancel", "turn_id": "t1"})
+        frames = [first] + receive_until_done(ws, ["t1"])
+
+    assert frames[-1] == {"turn_id": "t1", "event": "done", "data": {"cancelled": True}}
+    received = tokens(frames, "t1")
+    [persisted] = fake_pool.assistant_rows()
+    assert persisted.startswith(received)
+    assert len(persisted) < len("".join(f"c-{i} " for i in range(50)))
+
+
+def test_ws_cancel_mid_send_persists_partial(fake_pool, fake_llm, monkeypatch):
+    # Cancel lands while a token frame is being written, i.e. outside stream_agent.
+    monkeypatch.setattr(ws_module, "prepare_turn", stub_prepare_turn)
+    fake_llm["chunks"] = 50
+
+    class BlockingSocket:
+        def __init__(self):
+            self.app = SimpleNamespace(state=SimpleNamespace(db_pool=fake_pool))
+            self.frames = []
+            self.blocked = asyncio.Event()
+
+        async def send_json(self, frame):
+            if frame["event"] == "token" and not self.blocked.is_set():
+                self.blocked.set()
+                await asyncio.Event().wait()  # hang until cancelled
+            self.frames.append(frame)
+
+    async def main():
+        sock = BlockingSocket()
+        mux = TurnMux(sock, "u", expires_at=time.time() + 60)
+        await mux.handle(chat_frame("t1", "m"))
+        task = mux.turns["t1"]
+        await sock.blocked.wait()
+        await mux.handle({"type": "cancel", "turn_id": "t1"})
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert task.cancelled()
+        return sock.frames, mux
+
+    frames, mux = asyncio.run(main())
+    assert frames == [{"turn_id": "t1", "event": "done", "data": {"cancelled": True}}]
+    assert fake_pool.assistant_rows() == ["m-0 "]
+    assert mux.turns == {}
+
+
+@pytest.mark.parametrize("error", [WebSocketDisconnect(1001), RuntimeError("Cannot call \"send\" once a close message has been sent.")])
+def test_ws_send_failure_persists_partial(fake_pool, fake_llm, monkeypatch, error):
+    # The client drops while a token frame is being written, before the receive loop notices.
+    monkeypatch.setattr(ws_module, "prepare_turn", stub_prepare_turn)
+    fake_llm["chunks"] = 50
+
+    class DroppingSocket:
+        def __init__(self):
+            self.app = SimpleNamespace(state=SimpleNamespace(db_pool=fake_pool))
+            self.frames = []
+
+        async def send_json(self, frame):
+            if len(self.frames) == 2:
+                raise error
+            self.frames.append(frame)
+
+    async def main():
+        sock = DroppingSocket()
+        mux = TurnMux(sock, "u", expires_at=time.time() + 60)
+        await mux.handle(chat_frame("t1", "d"))
+        await mux.turns["t1"]
+        return sock.frames, mux
+
+    frames, mux = asyncio.run(main())
+    assert tokens(frames, "t1") == "d-0 d-1 "
+    # The third token was produced but never delivered; it is still part of the partial reply.
+    assert fake_pool.assistant_rows() == ["d-0 d-1 d-2 "]
+    assert mux.turns == {}
+    assert mux.connected is False
+
+
+def test_ws_rejects_chat_after_token_expiry(ws_client, monkeypatch):
+    # JWT validation uses real time; only the connection's expiry check sees the future.
+    monkeypatch.setattr(ws_module, "time", SimpleNamespace(time=lambda: time.time() + 7200))
+    with ws_client.websocket_connect("/ws") as ws:
+        connect(ws)
+        ws.send_json(chat_frame("t1", "late"))
+        error = ws.receive_json()
+        assert (error["turn_id"], error["event"], error["data"]["code"]) == ("t1", "error", "token_expired")
+        assert ws.receive_json() == {"turn_id": "t1", "event": "done", "data": {}}
+
+
+def test_ws_binary_frame(ws_client):
+    with ws_client.websocket_connect("/ws") as ws:
+        connect(ws)
+        ws.send_bytes(b"\x00\x01")
+        error = ws.receive_json()
+        assert (error["event"], error["data"]["code"]) == ("error", "invalid_frame")
+        # The connection stays usable.
+        ws.send_json({"type": "ping", "turn_id": "x"})
+        assert ws.receive_json()["data"]["code"] == "invalid_frame"